@@ -73,7 +73,9 @@ pip install -q --upgrade \
     aiogram>=3.10.0 \
     aiosqlite>=0.19.0 \
     yt-dlp>=2024.10.22 \
-    python-dotenv>=1.0.0
+    python-dotenv>=1.0.0 \
+    uvloop>=0.19.0 \
+    orjson>=3.9.0
 echo -e "${GREEN}✓ Python dependencies installed${NC}"
 
 # Create .env file if it doesn't exist
@@ -1,7 +1,6 @@
 """Entry point for running bot with: python3 -m src"""
 
-from src.bot import main
-import asyncio
+from src.bot import run
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run()
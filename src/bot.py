@@ -3,15 +3,27 @@
 import logging
 import asyncio
 import os
-import shutil
-from aiogram import Bot, Dispatcher, types, F
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+import re
+from typing import Any, Awaitable, Callable, Dict, Optional
+from aiogram import BaseMiddleware, Bot, Dispatcher, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, TelegramObject
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
+try:
+    import uvloop
+except ImportError:  # Optional: falls back to the default asyncio loop
+    uvloop = None
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the stdlib json module
+    orjson = None
+
 from src.database import Database
-from src.utils import logger, get_user_setting, set_user_setting
+from src.utils import logger
 from src.handlers import download_handler
 
 # Configure logging
@@ -27,6 +39,9 @@ class BotConfig:
     MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE_MB', '50')) * 1024 * 1024
     HANDBRAKE_PRESET = os.getenv('HANDBRAKE_PRESET', 'Very Fast 720p30')
     UPLOAD_TIMEOUT_SECONDS = int(os.getenv('UPLOAD_TIMEOUT_SECONDS', '600'))
+    POLLING_TIMEOUT_SECONDS = 50  # Telegram's maximum long-poll wait
+    SESSION_TIMEOUT_SECONDS = 60
+    SESSION_CONNECTION_LIMIT = int(os.getenv('SESSION_CONNECTION_LIMIT', '256'))
 
 
 class DownloadStates(StatesGroup):
@@ -36,154 +51,236 @@ class DownloadStates(StatesGroup):
     downloading = State()
 
 
+# State names resolved once for the hot comparison paths
+_STATE_WAITING_FOR_URL = DownloadStates.waiting_for_url.state
+_STATE_WAITING_FOR_CONFIRMATION = DownloadStates.waiting_for_confirmation.state
+_STATE_DOWNLOADING = DownloadStates.downloading.state
+
+
+# Keyboards and texts are built once at import time and reused by every handler
+MAIN_MENU_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="⬇️ Download Video", callback_data="start_download")],
+    [InlineKeyboardButton(text="ℹ️ Help", callback_data="show_help")],
+])
+
+BACK_TO_MENU_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="← Back", callback_data="back_to_menu")],
+])
+
+DOWNLOAD_CANCEL_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="❌ Cancel", callback_data="back_to_menu")],
+])
+
+START_TEXT = (
+    "🎬 *Video Download Bot*\n\n"
+    "Download videos from YouTube, TikTok, X, Instagram, and 1000+ other platforms!\n\n"
+    "📝 *How to use:*\n"
+    "1️⃣ Click 'Download Video' or just send me a URL\n"
+    "2️⃣ I'll download and optimize your video\n"
+    "3️⃣ Receive your video in Telegram\n\n"
+    "⚙️ *Features:*\n"
+    "• Supports 1000+ video platforms\n"
+    "• Automatic optimization\n"
+    "• Auto-cleanup of temp files\n"
+    "• Real-time progress updates\n\n"
+    "👇 Get started below or just paste a video URL!"
+)
+
+MENU_TEXT = (
+    "🎬 **Video Download Bot**\n\n"
+    "Send me a video URL from YouTube, TikTok, X, or any supported platform "
+    "and I'll download and optimize it for you."
+)
+
+HELP_TEXT = (
+    "📖 *How to Use*\n\n"
+    "1️⃣ *Send a Video URL*\n"
+    "Just paste any video link:\n"
+    "• YouTube: youtube.com/watch?v=...\n"
+    "• TikTok: tiktok.com/@.../video/...\n"
+    "• Instagram, X, Facebook, etc.\n"
+    "• And 1000+ more platforms!\n\n"
+    "2️⃣ *Wait for Processing*\n"
+    "• Download takes 1-5 minutes\n"
+    "• Automatic optimization applied\n"
+    "• Progress updates shown in real-time\n\n"
+    "3️⃣ *Get Your Video*\n"
+    "Video sent when ready!\n\n"
+    "🛠️ *Commands*\n"
+    "/start - Restart the bot\n"
+    "/cancel - Cancel current download\n\n"
+    "❓ *Troubleshooting*\n"
+    "• Video too large? Try shorter clips\n"
+    "• URL not working? Try another video\n"
+    "• Bot stuck? Use /cancel to reset\n\n"
+    "💡 Max file size: 50MB"
+)
+
+CANCELLED_TEXT = (
+    "✅ *Download Cancelled*\n\n"
+    "Any ongoing download has been stopped and state cleared.\n"
+    "You can now start a new download by sending a video URL."
+)
+
+NO_ACTIVE_DOWNLOAD_TEXT = (
+    "ℹ️ *No Active Download*\n\n"
+    "There was no download in progress.\n"
+    "Send me a video URL to get started!"
+)
+
+
+# http(s) URL of at most 2048 characters, surrounding whitespace allowed
+_URL_RE = re.compile(r'\s*(https?://\S{1,2040})\s*\Z')
+
+
+# In-process whitelist, populated at startup to keep DB queries off the hot path
+_whitelist_cache: set[int] = set()
+
+
+async def refresh_whitelist_cache(db: Database):
+    """Reload the in-process whitelist from the database."""
+    _whitelist_cache.clear()
+    _whitelist_cache.update(await db.get_whitelisted_users())
+
+
 async def check_authorization(user_id: int, db: Database) -> bool:
     """Check if user is whitelisted."""
-    return await db.is_user_whitelisted(user_id)
+    return user_id in _whitelist_cache
+
+
+class AuthorizationMiddleware(BaseMiddleware):
+    """Reject updates from non-whitelisted users before they reach a handler."""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = getattr(event, 'from_user', None)
+        if user is not None and await check_authorization(user.id, data.get('db')):
+            return await handler(event, data)
+        
+        user_id = user.id if user else None
+        logger.warning(f"Unauthorized access attempt from user {user_id}")
+        try:
+            if isinstance(event, types.CallbackQuery):
+                await event.answer("❌ Unauthorized", show_alert=True)
+            elif isinstance(event, types.Message):
+                await event.answer("❌ You are not authorized to use this bot.")
+        except Exception as e:
+            logger.error(f"Failed to send unauthorized reply to user {user_id}: {e}")
+        return None
+
+
+class FSMStatePrefetchMiddleware(BaseMiddleware):
+    """Fetch the current FSM state once and expose it to handlers as ``fsm_state``."""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        state = data.get('state')
+        data['fsm_state'] = await state.get_state() if state is not None else None
+        return await handler(event, data)
+
+
+# Per-user FIFO job queues; long downloads run in a worker task per user so
+# update handlers never await them inline. Workers exit once their queue is
+# drained, so both maps only hold users with pending work.
+_user_workers: dict[int, asyncio.Queue] = {}
+_worker_tasks: dict[int, asyncio.Task] = {}
+
+
+async def _download_worker(user_id: int, queue: asyncio.Queue):
+    """Run queued download jobs for one user, in submission order."""
+    # No await between the empty check and the removal below, so a job
+    # enqueued meanwhile always finds this worker still registered
+    while not queue.empty():
+        job = queue.get_nowait()
+        try:
+            await job()
+        except Exception as e:
+            logger.error(f"Download job failed for user {user_id}: {e}")
+        finally:
+            queue.task_done()
+    _user_workers.pop(user_id, None)
+    _worker_tasks.pop(user_id, None)
+
+
+async def enqueue_download(user_id: int, job):
+    """Queue a download job (zero-arg coroutine factory) for a user's worker."""
+    queue = _user_workers.get(user_id)
+    if queue is None:
+        queue = _user_workers[user_id] = asyncio.Queue()
+        queue.put_nowait(job)  # Before the worker starts, so it never sees an empty queue
+        _worker_tasks[user_id] = asyncio.create_task(_download_worker(user_id, queue))
+    else:
+        queue.put_nowait(job)
 
 
 async def start_handler(message: types.Message, state: FSMContext, db: Database):
     """Handle /start command."""
     user_id = message.from_user.id
     
-    if not await check_authorization(user_id, db):
-        logger.warning(f"Unauthorized access attempt from user {user_id}")
-        await message.answer("❌ You are not authorized to use this bot.")
-        return
-    
-    logger.info(f"User {user_id} started the bot")
+    logger.info("User %s started the bot", user_id)
     
     await state.clear()
     
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="⬇️ Download Video", callback_data="start_download")],
-        [InlineKeyboardButton(text="ℹ️ Help", callback_data="show_help")],
-    ])
-    
     await message.answer(
-        "🎬 *Video Download Bot*\n\n"
-        "Download videos from YouTube, TikTok, X, Instagram, and 1000+ other platforms!\n\n"
-        "📝 *How to use:*\n"
-        "1️⃣ Click 'Download Video' or just send me a URL\n"
-        "2️⃣ I'll download and optimize your video\n"
-        "3️⃣ Receive your video in Telegram\n\n"
-        "⚙️ *Features:*\n"
-        "• Supports 1000+ video platforms\n"
-        "• Automatic optimization\n"
-        "• Auto-cleanup of temp files\n"
-        "• Real-time progress updates\n\n"
-        "👇 Get started below or just paste a video URL!",
-        reply_markup=keyboard,
+        START_TEXT,
+        reply_markup=MAIN_MENU_KB,
         parse_mode="Markdown"
     )
 
 
-async def cancel_handler(message: types.Message, state: FSMContext, db: Database):
+async def cancel_handler(message: types.Message, state: FSMContext, db: Database, fsm_state: Optional[str] = None):
     """Handle /cancel command to clear stuck download states."""
     user_id = message.from_user.id
     
-    if not await check_authorization(user_id, db):
-        logger.warning(f"Unauthorized cancel attempt from user {user_id}")
-        await message.answer("❌ You are not authorized to use this bot.")
-        return
-    
-    # Get current state
-    current_state = await state.get_state()
+    # Current state was prefetched by FSMStatePrefetchMiddleware
+    current_state = fsm_state
     
     # Clear the state
     await state.clear()
     
-    logger.info(f"User {user_id} cancelled download (was in state: {current_state})")
+    logger.info("User %s cancelled download (was in state: %s)", user_id, current_state)
     
     if current_state:
         await message.answer(
-            "✅ *Download Cancelled*\n\n"
-            "Any ongoing download has been stopped and state cleared.\n"
-            "You can now start a new download by sending a video URL.",
+            CANCELLED_TEXT,
             parse_mode="Markdown"
         )
     else:
         await message.answer(
-            "ℹ️ *No Active Download*\n\n"
-            "There was no download in progress.\n"
-            "Send me a video URL to get started!",
+            NO_ACTIVE_DOWNLOAD_TEXT,
             parse_mode="Markdown"
         )
 
 
-async def help_handler(callback_query: types.CallbackQuery, state: FSMContext, db: Database):
+async def help_handler(callback_query: types.CallbackQuery, state: FSMContext, db: Database, fsm_state: Optional[str] = None):
     """Show help information."""
-    user_id = callback_query.from_user.id
-    
-    if not await check_authorization(user_id, db):
-        await callback_query.answer("❌ Unauthorized", show_alert=True)
-        return
-    
-    help_text = (
-        "📖 *How to Use*\n\n"
-        "1️⃣ *Send a Video URL*\n"
-        "Just paste any video link:\n"
-        "• YouTube: youtube.com/watch?v=...\n"
-        "• TikTok: tiktok.com/@.../video/...\n"
-        "• Instagram, X, Facebook, etc.\n"
-        "• And 1000+ more platforms!\n\n"
-        "2️⃣ *Wait for Processing*\n"
-        "• Download takes 1-5 minutes\n"
-        "• Automatic optimization applied\n"
-        "• Progress updates shown in real-time\n\n"
-        "3️⃣ *Get Your Video*\n"
-        "Video sent when ready!\n\n"
-        "🛠️ *Commands*\n"
-        "/start - Restart the bot\n"
-        "/cancel - Cancel current download\n\n"
-        "❓ *Troubleshooting*\n"
-        "• Video too large? Try shorter clips\n"
-        "• URL not working? Try another video\n"
-        "• Bot stuck? Use /cancel to reset\n\n"
-        "💡 Max file size: 50MB"
-    )
-    
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="← Back", callback_data="back_to_menu")],
-    ])
-    
-    await callback_query.message.edit_text(help_text, reply_markup=keyboard, parse_mode="Markdown")
+    await callback_query.message.edit_text(HELP_TEXT, reply_markup=BACK_TO_MENU_KB, parse_mode="Markdown")
     await callback_query.answer()
 
 
-async def back_to_menu_handler(callback_query: types.CallbackQuery, state: FSMContext, db: Database):
+async def back_to_menu_handler(callback_query: types.CallbackQuery, state: FSMContext, db: Database, fsm_state: Optional[str] = None):
     """Return to main menu."""
-    user_id = callback_query.from_user.id
-    
-    if not await check_authorization(user_id, db):
-        await callback_query.answer("❌ Unauthorized", show_alert=True)
-        return
-    
     await state.clear()
     
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="⬇️ Download Video", callback_data="start_download")],
-        [InlineKeyboardButton(text="ℹ️ Help", callback_data="show_help")],
-    ])
-    
     await callback_query.message.edit_text(
-        "🎬 **Video Download Bot**\n\n"
-        "Send me a video URL from YouTube, TikTok, X, or any supported platform "
-        "and I'll download and optimize it for you.",
-        reply_markup=keyboard,
+        MENU_TEXT,
+        reply_markup=MAIN_MENU_KB,
         parse_mode="Markdown"
     )
     await callback_query.answer()
 
 
-async def start_download_handler(callback_query: types.CallbackQuery, state: FSMContext, db: Database):
+async def start_download_handler(callback_query: types.CallbackQuery, state: FSMContext, db: Database, fsm_state: Optional[str] = None):
     """Start download flow."""
-    user_id = callback_query.from_user.id
-    
-    if not await check_authorization(user_id, db):
-        await callback_query.answer("❌ Unauthorized", show_alert=True)
-        return
-    
-    await state.set_state(DownloadStates.waiting_for_url)
+    await state.set_state(_STATE_WAITING_FOR_URL)
     
     await callback_query.message.edit_text(
         "📎 Send me a video URL:\n\n"
@@ -191,44 +288,43 @@ async def start_download_handler(callback_query: types.CallbackQuery, state: FSM
         "• https://www.youtube.com/watch?v=...\n"
         "• https://www.tiktok.com/@.../video/...\n"
         "• https://x.com/.../status/...",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="❌ Cancel", callback_data="back_to_menu")],
-        ])
+        reply_markup=DOWNLOAD_CANCEL_KB
     )
     await callback_query.answer()
 
 
-async def url_message_handler(message: types.Message, state: FSMContext, db: Database):
+async def url_message_handler(message: types.Message, state: FSMContext, db: Database, fsm_state: Optional[str] = None):
     """Handle URL submission."""
     user_id = message.from_user.id
     
-    if not await check_authorization(user_id, db):
-        await message.answer("❌ Unauthorized")
-        return
-    
-    current_state = await state.get_state()
-    url = message.text
+    current_state = fsm_state
+    text = message.text
     
-    # Validate URL input
-    if not url or not isinstance(url, str):
+    # Validate URL input (non-text messages have no text)
+    if not text:
         await message.answer("❌ Invalid input")
         return
     
     # Limit URL length (max 2048 chars is reasonable for URLs)
-    if len(url) > 2048:
+    if len(text) > 2048:
         await message.answer("❌ URL is too long (max 2048 characters)")
         return
     
-    # Strip whitespace
-    url = url.strip()
-    
-    # Check if this looks like a URL
-    if not url.startswith(('http://', 'https://')):
+    # Scheme check and whitespace trim in one match
+    match = _URL_RE.match(text)
+    if not match:
+        if text.lstrip().startswith(('http://', 'https://')):
+            # Looks like a link but is not a bare URL (e.g. trailing words)
+            try:
+                await message.answer(download_handler.INVALID_URL_TEXT)
+            except Exception as e:
+                logger.error(f"Failed to send URL validation error to user {user_id}: {e}")
         # Not a URL, ignore it
         return
+    url = match.group(1)
     
     # Allow URLs anytime, but block if already downloading
-    if current_state == DownloadStates.downloading.state:
+    if current_state == _STATE_DOWNLOADING:
         logger.warning(f"User {user_id} sent URL while downloading: {url[:50]}...")
         try:
             await message.answer("⏳ Already processing a download. Please wait...")
@@ -236,148 +332,139 @@ async def url_message_handler(message: types.Message, state: FSMContext, db: Dat
             logger.error(f"Failed to send state error to user {user_id}: {e}")
         return
     
-    logger.info(f"User {user_id} submitted URL: {url[:50]}...")
+    logger.info("User %s submitted URL: %.50s...", user_id, url)
     
-    # Call download handler
-    await download_handler.process_download(message, state, db, url, BotConfig, DownloadStates)
+    # Hand off to the per-user worker so this update returns immediately
+    await enqueue_download(
+        user_id,
+        lambda: download_handler.process_download(message, state, db, url, BotConfig, DownloadStates)
+    )
 
 
-async def confirmation_handler(callback_query: types.CallbackQuery, state: FSMContext, db: Database):
+async def confirmation_handler(callback_query: types.CallbackQuery, state: FSMContext, db: Database, fsm_state: Optional[str] = None):
     """Handle file size confirmation."""
     user_id = callback_query.from_user.id
     
-    if not await check_authorization(user_id, db):
-        await callback_query.answer("❌ Unauthorized", show_alert=True)
-        return
-    
     # Validate FSM state before processing confirmation
-    current_state = await state.get_state()
-    if current_state != DownloadStates.waiting_for_confirmation.state:
+    current_state = fsm_state
+    if current_state != _STATE_WAITING_FOR_CONFIRMATION:
         logger.warning(f"User {user_id} sent confirmation callback in wrong state: {current_state}")
         await callback_query.answer("❌ Invalid state. Please start over.", show_alert=True)
         return
     
-    # Validate callback data
-    if not callback_query.data or not isinstance(callback_query.data, str):
-        await callback_query.answer("❌ Invalid request", show_alert=True)
-        return
-    
-    # Retrieve pending URL from database (more reliable than FSM state)
-    try:
-        pending_url = await db.get_user_setting(user_id, 'pending_url')
-    except Exception as e:
-        logger.error(f"Failed to get pending URL for user {user_id}: {e}")
-        await callback_query.answer("❌ Database error. Please try again.", show_alert=True)
-        await state.clear()
-        return
+    # Retrieve pending URL from FSM data (cleared together with the state)
+    pending_url = (await state.get_data()).get('pending_url')
     
     # Validate pending URL exists
-    if not pending_url or not isinstance(pending_url, str):
+    if not pending_url:
         logger.warning(f"No pending URL for user {user_id}")
         await callback_query.answer("❌ No pending download", show_alert=True)
         await state.clear()
         return
     
-    # Validate URL length
-    if len(pending_url) > 2048:
-        logger.warning(f"Pending URL too long for user {user_id}")
+    # Validate URL format and length
+    if not _URL_RE.match(pending_url):
+        logger.warning(f"Pending URL invalid for user {user_id}")
         await callback_query.answer("❌ URL is invalid", show_alert=True)
-        try:
-            await db.set_user_setting(user_id, 'pending_url', '')  # Clear pending URL
-        except Exception as e:
-            logger.error(f"Failed to clear pending URL for user {user_id}: {e}")
         await state.clear()
         return
     
     if callback_query.data == "confirm_yes":
         # User confirmed, proceed with download
-        logger.info(f"User {user_id} confirmed download")
-        await callback_query.answer("✅ Starting download...")
-        
-        # Get message object and delete the confirmation dialog
+        logger.info("User %s confirmed download", user_id)
         message = callback_query.message
-        try:
-            await message.delete()
-        except Exception as e:
-            logger.debug(f"Failed to delete confirmation message for user {user_id}: {e}")
         
-        # Send a fresh message to use for status updates during download
-        try:
-            new_message = await message.answer("⏳ Processing your video...")
-        except Exception as e:
-            logger.error(f"Failed to send processing message for user {user_id}: {e}")
-            return
+        # These calls are independent, so run them concurrently: acknowledge the
+        # click, delete the confirmation dialog, clear the pending URL and send a
+        # fresh message to use for status updates during download
+        _, delete_result, _, new_message = await asyncio.gather(
+            callback_query.answer("✅ Starting download..."),
+            message.delete(),
+            state.update_data(pending_url=None),
+            message.answer("⏳ Processing your video..."),
+            return_exceptions=True
+        )
         
-        # Clear pending URL from database before processing
-        try:
-            await db.set_user_setting(user_id, 'pending_url', '')
-        except Exception as e:
-            logger.error(f"Failed to clear pending URL for user {user_id}: {e}")
+        if isinstance(delete_result, Exception):
+            logger.debug("Failed to delete confirmation message for user %s: %s", user_id, delete_result)
+        if isinstance(new_message, Exception):
+            logger.error(f"Failed to send processing message for user {user_id}: {new_message}")
+            return
         
         # Process the download (skip file size re-check)
-        await download_handler.execute_confirmed_download(user_id, new_message, state, db, pending_url, BotConfig, DownloadStates)
+        await enqueue_download(
+            user_id,
+            lambda: download_handler.execute_confirmed_download(user_id, new_message, state, db, pending_url, BotConfig, DownloadStates)
+        )
     
     elif callback_query.data == "confirm_no":
         # User declined
-        logger.info(f"User {user_id} declined download")
+        logger.info("User %s declined download", user_id)
         await callback_query.answer("❌ Download cancelled")
         
-        # Clear pending URL from database
-        try:
-            await db.set_user_setting(user_id, 'pending_url', '')
-        except Exception as e:
-            logger.error(f"Failed to clear pending URL for user {user_id}: {e}")
+        await state.clear()
         
-        # Delete the confirmation message
+        # Turn the confirmation message into the main menu in a single API call
         try:
-            await callback_query.message.delete()
+            await callback_query.message.edit_text(MENU_TEXT, reply_markup=MAIN_MENU_KB, parse_mode="Markdown")
         except Exception as e:
-            logger.debug(f"Failed to delete confirmation message for user {user_id}: {e}")
-        
-        await state.clear()
+            logger.debug("Failed to show menu for user %s: %s", user_id, e)
     else:
         # Invalid callback data
         logger.warning(f"Invalid callback data from user {user_id}: {callback_query.data}")
         await callback_query.answer("❓ Please choose Yes or No", show_alert=True)
 
 
-async def setup_handlers(dp: Dispatcher, db: Database):
-    """Register all message and callback handlers."""
-    
-    # Create handler wrappers that inject db parameter
-    async def start_handler_wrapper(message: types.Message, state: FSMContext):
-        return await start_handler(message, state, db)
-    
-    async def cancel_handler_wrapper(message: types.Message, state: FSMContext):
-        return await cancel_handler(message, state, db)
+# Callback data (prefix before any ":") -> handler, dispatched with a single dict lookup
+CALLBACK_ROUTES = {
+    "show_help": help_handler,
+    "back_to_menu": back_to_menu_handler,
+    "start_download": start_download_handler,
+    "confirm_yes": confirmation_handler,
+    "confirm_no": confirmation_handler,
+}
+
+
+async def callback_router(callback_query: types.CallbackQuery, state: FSMContext, db: Database, fsm_state: Optional[str] = None):
+    """Route a callback query to its handler by callback data prefix."""
+    data = callback_query.data
+    if not data:
+        await callback_query.answer("❌ Invalid request", show_alert=True)
+        return
     
-    async def help_handler_wrapper(callback_query: types.CallbackQuery, state: FSMContext):
-        return await help_handler(callback_query, state, db)
+    handler = CALLBACK_ROUTES.get(data.partition(':')[0])
+    if handler is None:
+        logger.warning(f"Unknown callback data from user {callback_query.from_user.id}: {data[:64]}")
+        await callback_query.answer("❌ Invalid request", show_alert=True)
+        return
     
-    async def back_to_menu_wrapper(callback_query: types.CallbackQuery, state: FSMContext):
-        return await back_to_menu_handler(callback_query, state, db)
+    await handler(callback_query, state, db, fsm_state)
+
+
+async def setup_handlers(dp: Dispatcher):
+    """Register all message and callback handlers.
     
-    async def start_download_wrapper(callback_query: types.CallbackQuery, state: FSMContext):
-        return await start_download_handler(callback_query, state, db)
+    Handlers receive the ``db`` argument from the dispatcher's workflow data
+    (set in ``main`` via ``dp["db"]``), so no injection wrappers are needed.
+    """
     
-    async def confirmation_wrapper(callback_query: types.CallbackQuery, state: FSMContext):
-        return await confirmation_handler(callback_query, state, db)
+    # Authorization runs once per update, before any handler
+    dp.message.outer_middleware(AuthorizationMiddleware())
+    dp.callback_query.outer_middleware(AuthorizationMiddleware())
     
-    async def url_message_wrapper(message: types.Message, state: FSMContext):
-        return await url_message_handler(message, state, db)
+    # Fetch the FSM state once per update and hand it to handlers as fsm_state
+    dp.message.outer_middleware(FSMStatePrefetchMiddleware())
+    dp.callback_query.outer_middleware(FSMStatePrefetchMiddleware())
     
     # Command handlers
-    dp.message.register(start_handler_wrapper, Command("start"))
-    dp.message.register(cancel_handler_wrapper, Command("cancel"))
+    dp.message.register(start_handler, Command("start"))
+    dp.message.register(cancel_handler, Command("cancel"))
     
-    # Callback query handlers
-    dp.callback_query.register(help_handler_wrapper, F.data == "show_help")
-    dp.callback_query.register(back_to_menu_wrapper, F.data == "back_to_menu")
-    dp.callback_query.register(start_download_wrapper, F.data == "start_download")
-    dp.callback_query.register(confirmation_wrapper, F.data.in_(["confirm_yes", "confirm_no"]))
+    # Callback query handlers (single entry point, see CALLBACK_ROUTES)
+    dp.callback_query.register(callback_router)
     
     # Message handlers for URL input (must be last to not interfere with other handlers)
-    dp.message.register(url_message_wrapper)
+    dp.message.register(url_message_handler)
 
 
 async def main():
@@ -392,23 +479,52 @@ async def main():
     
     # Add authorized user to whitelist if not exists
     await db.add_user(BotConfig.ALLOWED_USER_ID, is_whitelisted=True)
-    
-    # Initialize bot with default session
-    # Note: Connection pooling and timeouts are handled by aiogram internally
-    bot = Bot(token=BotConfig.BOT_TOKEN)
+    await refresh_whitelist_cache(db)
+    
+    # Initialize bot with an explicit session timeout
+    # (aiogram adds the polling timeout on top of it for getUpdates)
+    session_kwargs = {}
+    if orjson is not None:
+        # aiogram expects json_dumps to return str
+        session_kwargs['json_loads'] = orjson.loads
+        session_kwargs['json_dumps'] = lambda obj: orjson.dumps(obj).decode()
+    session = AiohttpSession(
+        limit=BotConfig.SESSION_CONNECTION_LIMIT,
+        timeout=BotConfig.SESSION_TIMEOUT_SECONDS,
+        **session_kwargs
+    )
+    bot = Bot(token=BotConfig.BOT_TOKEN, session=session)
     dp = Dispatcher()
+    dp["db"] = db
     
     # Register handlers
-    await setup_handlers(dp, db)
+    await setup_handlers(dp)
+    
+    # Resolve update types once, before polling starts
+    allowed_updates = dp.resolve_used_update_types()
     
     logger.info("Bot started polling...")
     
     try:
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        await dp.start_polling(
+            bot,
+            polling_timeout=BotConfig.POLLING_TIMEOUT_SECONDS,
+            allowed_updates=allowed_updates,
+            handle_signals=True
+        )
     finally:
         await bot.session.close()
+        await download_handler.close_http_session()
         await db.close()
 
 
+def run():
+    """Run the bot, using uvloop as the event loop when it is available."""
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    run()
@@ -1,12 +1,51 @@
 """Database management using SQLite and aiosqlite."""
 
 import aiosqlite
+import asyncio
 import os
-from datetime import datetime, timedelta
+import random
+import sqlite3
+from contextlib import asynccontextmanager
+import time
+from collections import OrderedDict
 from typing import Optional, List
 
+from src.utils import logger
+
 DB_PATH = os.getenv('DATABASE_FILE', '/opt/video-bot/bot.db')
 
+# WAL + synchronous=NORMAL avoids an fsync per commit; the rest trims I/O
+SQLITE_PRAGMAS = (
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    'temp_store=MEMORY',
+    'cache_size=-64000',  # ~64MB page cache
+    'mmap_size=268435456',  # 256MB
+    'busy_timeout=5000',
+)
+
+# Bumped when a one-off data migration is added to initialize()
+SCHEMA_VERSION = 1
+
+# Logs older than this are deleted by cleanup_old_logs (48h)
+LOG_RETENTION_SECONDS = 48 * 3600
+
+# Buffered log rows are written in one transaction when either limit is hit
+LOG_FLUSH_BATCH_SIZE = 100
+LOG_FLUSH_INTERVAL_SECONDS = 1.0
+
+# Per-user settings are cached in-process, bounded and briefly, like the info cache
+SETTINGS_CACHE_MAX_ENTRIES = 1000
+SETTINGS_CACHE_TTL_SECONDS = 60
+
+# How often old logs are purged while the bot is running
+LOG_CLEANUP_INTERVAL_SECONDS = 3600
+
+# Writes that hit a locked/busy database are retried with jittered backoff
+WRITE_RETRY_ATTEMPTS = 3
+WRITE_RETRY_BASE_DELAY = 0.05
+WRITE_RETRY_MAX_DELAY = 0.5
+
 
 class Database:
     """SQLite database handler with async support."""
@@ -14,57 +53,138 @@ class Database:
     def __init__(self, db_path: str = DB_PATH):
         self.db_path = db_path
         self.db = None
+        self._log_buffer: List[tuple[int, str, str]] = []
+        self._write_lock = asyncio.Lock()  # Serializes transactions on the shared connection
+        self._flush_task: Optional[asyncio.Task] = None
+        self._cleanup_task: Optional[asyncio.Task] = None
+        # user_id -> (monotonic time cached, all settings of the user), oldest first
+        self._settings_cache: OrderedDict[int, tuple[float, dict[str, Optional[str]]]] = OrderedDict()
+        self._settings_writes = 0  # Bumped per set_user_setting; overlapping reads are not cached
     
     async def initialize(self):
         """Initialize database and create tables if needed."""
-        self.db = await aiosqlite.connect(self.db_path)
+        # Autocommit mode: sqlite3 never opens implicit transactions, so every
+        # write batch is exactly one BEGIN IMMEDIATE ... COMMIT from transaction()
+        self.db = await aiosqlite.connect(self.db_path, isolation_level=None)
         
-        # Create tables
-        await self.db.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                is_whitelisted BOOLEAN DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        # Tune connection before any schema work so the WAL file is set up once
+        for pragma in SQLITE_PRAGMAS:
+            await self.db.execute(f'PRAGMA {pragma}')
         
-        await self.db.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                key TEXT NOT NULL,
-                value TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(user_id, key)
-            )
-        ''')
+        cursor = await self.db.execute('PRAGMA user_version')
+        (version,) = await cursor.fetchone()
         
-        await self.db.execute('''
-            CREATE TABLE IF NOT EXISTS logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                level TEXT,
-                message TEXT
-            )
-        ''')
+        # Schema and migration are applied atomically in one explicit transaction
+        async with self.transaction():
+            await self.db.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id INTEGER PRIMARY KEY,
+                    is_whitelisted BOOLEAN DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+        
+            await self.db.execute('''
+                CREATE TABLE IF NOT EXISTS settings (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(user_id, key)
+                )
+            ''')
+        
+            await self.db.execute('''
+                CREATE TABLE IF NOT EXISTS logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+                    level TEXT,
+                    message TEXT
+                )
+            ''')
         
-        await self.db.commit()
+            if version < 1:
+                # Convert rows written before timestamps were stored as Unix seconds;
+                # unparsable ones become 0 so cleanup_old_logs still purges them
+                await self.db.execute(
+                    "UPDATE logs SET timestamp = COALESCE(CAST(strftime('%s', timestamp) AS INTEGER), 0) "
+                    "WHERE typeof(timestamp) = 'text'"
+                )
+            
+            await self.db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        
+            # Range index for cleanup_old_logs (settings(user_id, key) is already
+            # indexed by its UNIQUE constraint)
+            await self.db.execute(
+                'CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp)'
+            )
         
         # Cleanup old logs (>48h)
         await self.cleanup_old_logs()
+        
+        self._cleanup_task = asyncio.create_task(self._periodic_cleanup())
     
     async def close(self):
         """Close database connection."""
+        # Holding the write lock means neither task is mid-statement when cancelled
+        async with self._write_lock:
+            for task in (self._flush_task, self._cleanup_task):
+                if task:
+                    task.cancel()
+                    try:
+                        await task
+                    except asyncio.CancelledError:
+                        pass
+        self._flush_task = None
+        self._cleanup_task = None
+        
         if self.db:
+            await self.flush_logs()
             await self.db.close()
     
+    @asynccontextmanager
+    async def transaction(self):
+        """Run the enclosed statements in one write transaction (one commit)."""
+        async with self._write_lock:
+            await self.db.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.db
+            except BaseException:
+                await self.db.execute('ROLLBACK')
+                raise
+            else:
+                await self.db.execute('COMMIT')
+    
+    async def _write(self, sql: str, params, many: bool = False):
+        """Run one write statement in its own transaction.
+        
+        Transient lock errors (database is locked/busy) are retried up to
+        WRITE_RETRY_ATTEMPTS times; anything else, e.g. IntegrityError, is
+        raised immediately.
+        """
+        for attempt in range(1, WRITE_RETRY_ATTEMPTS + 1):
+            try:
+                async with self.transaction():
+                    if many:
+                        await self.db.executemany(sql, params)
+                    else:
+                        await self.db.execute(sql, params)
+                return
+            except sqlite3.OperationalError as e:
+                error_str = str(e).lower()
+                if attempt == WRITE_RETRY_ATTEMPTS or ('locked' not in error_str and 'busy' not in error_str):
+                    raise
+                delay = min(WRITE_RETRY_MAX_DELAY, WRITE_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+                logger.warning(f"Database write attempt {attempt}/{WRITE_RETRY_ATTEMPTS} failed: {e}. Retrying in {delay:.2f}s...")
+                await asyncio.sleep(delay + random.uniform(0, 0.01))
+    
     async def add_user(self, user_id: int, is_whitelisted: bool = False):
         """Add a user to the database."""
-        await self.db.execute(
+        await self._write(
             'INSERT OR IGNORE INTO users (user_id, is_whitelisted) VALUES (?, ?)',
             (user_id, is_whitelisted)
         )
-        await self.db.commit()
     
     async def is_user_whitelisted(self, user_id: int) -> bool:
         """Check if user is whitelisted."""
@@ -73,43 +193,104 @@ class Database:
             (user_id,)
         )
         row = await cursor.fetchone()
-        return row[0] if row else False
+        return bool(row[0]) if row else False
+    
+    async def get_whitelisted_users(self) -> List[int]:
+        """Get IDs of all whitelisted users."""
+        cursor = await self.db.execute(
+            'SELECT user_id FROM users WHERE is_whitelisted = 1'
+        )
+        rows = await cursor.fetchall()
+        return [row[0] for row in rows]
     
     async def set_user_setting(self, user_id: int, key: str, value: str):
         """Set a user setting."""
-        # Ensure user exists
-        await self.add_user(user_id)
-        
-        await self.db.execute(
+        self._settings_writes += 1
+        # settings has no foreign key to users, so a single UPSERT is enough
+        await self._write(
             '''INSERT INTO settings (user_id, key, value) 
                VALUES (?, ?, ?)
-               ON CONFLICT(user_id, key) DO UPDATE SET value=?, updated_at=CURRENT_TIMESTAMP''',
-            (user_id, key, value, value)
+               ON CONFLICT(user_id, key) DO UPDATE SET value=excluded.value, updated_at=CURRENT_TIMESTAMP''',
+            (user_id, key, value)
         )
-        await self.db.commit()
+        self._settings_cache.pop(user_id, None)
     
-    async def get_user_setting(self, user_id: int, key: str) -> Optional[str]:
-        """Get a user setting."""
+    async def get_user_settings(self, user_id: int) -> dict[str, Optional[str]]:
+        """Get all settings of a user (one query, then cached for a short while)."""
+        entry = self._settings_cache.get(user_id)
+        if entry is not None and time.monotonic() - entry[0] < SETTINGS_CACHE_TTL_SECONDS:
+            self._settings_cache.move_to_end(user_id)
+            return entry[1]
+        
+        writes = self._settings_writes
         cursor = await self.db.execute(
-            'SELECT value FROM settings WHERE user_id = ? AND key = ?',
-            (user_id, key)
+            'SELECT key, value FROM settings WHERE user_id = ?',
+            (user_id,)
         )
-        row = await cursor.fetchone()
-        return row[0] if row else None
+        settings = dict(await cursor.fetchall())
+        # A write that started during the query may not be in this snapshot
+        if writes == self._settings_writes:
+            self._settings_cache[user_id] = (time.monotonic(), settings)
+            self._settings_cache.move_to_end(user_id)
+            while len(self._settings_cache) > SETTINGS_CACHE_MAX_ENTRIES:
+                self._settings_cache.popitem(last=False)
+        return settings
+    
+    async def get_user_setting(self, user_id: int, key: str) -> Optional[str]:
+        """Get a user setting."""
+        return (await self.get_user_settings(user_id)).get(key)
     
     async def log_action(self, level: str, message: str):
-        """Log an action to the database."""
-        await self.db.execute(
-            'INSERT INTO logs (level, message) VALUES (?, ?)',
-            (level, message)
-        )
-        await self.db.commit()
+        """Log an action to the database.
+        
+        Rows are buffered and written in batches by ``flush_logs``; the
+        periodic flush task is started by the first buffered row.
+        """
+        self._log_buffer.append((int(time.time()), level, message))
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        if len(self._log_buffer) >= LOG_FLUSH_BATCH_SIZE:
+            await self.flush_logs()
+    
+    async def flush_logs(self):
+        """Write all buffered log rows in a single transaction."""
+        if not self._log_buffer:
+            return
+        rows, self._log_buffer = self._log_buffer, []
+        try:
+            await self._write(
+                'INSERT INTO logs (timestamp, level, message) VALUES (?, ?, ?)',
+                rows,
+                many=True
+            )
+        except asyncio.CancelledError:
+            # Cancelled before the batch was written (see close()); keep it for the final flush
+            self._log_buffer[:0] = rows
+            raise
+    
+    async def _flush_loop(self):
+        """Periodically flush buffered log rows."""
+        while True:
+            await asyncio.sleep(LOG_FLUSH_INTERVAL_SECONDS)
+            try:
+                await self.flush_logs()
+            except Exception as e:
+                # Keep flushing on later ticks; rows of a failed batch are dropped
+                logger.warning(f"Failed to flush log rows: {e}")
+    
+    async def _periodic_cleanup(self):
+        """Purge old logs every LOG_CLEANUP_INTERVAL_SECONDS so the table stays bounded."""
+        while True:
+            await asyncio.sleep(LOG_CLEANUP_INTERVAL_SECONDS)
+            try:
+                await self.cleanup_old_logs()
+            except Exception as e:
+                logger.warning(f"Failed to cleanup old logs: {e}")
     
     async def cleanup_old_logs(self):
         """Delete logs older than 48 hours."""
-        cutoff_time = datetime.utcnow() - timedelta(hours=48)
-        await self.db.execute(
+        cutoff = int(time.time()) - LOG_RETENTION_SECONDS
+        await self._write(
             'DELETE FROM logs WHERE timestamp < ?',
-            (cutoff_time.isoformat(),)
+            (cutoff,)
         )
-        await self.db.commit()
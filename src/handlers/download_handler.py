@@ -1,32 +1,145 @@
 """Download handler for video downloads."""
 
 import asyncio
+import copy
 import os
+import random
 import shutil
 import tempfile
+import threading
+import time
 import subprocess
 import re
-from typing import Optional, Callable, Any
-from urllib.parse import urlparse
-import yt_dlp
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from typing import TYPE_CHECKING, Optional, Callable, Any
+import aiohttp
 
 from aiogram import types
 from aiogram.fsm.context import FSMContext
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
 
 from src.database import Database
-from src.utils import logger
+from src.utils import logger, ThrottledEditor
 
-# Concurrency control: Limit simultaneous downloads to prevent bot rate limits
-# Using a semaphore to allow 1 download per user at a time
-_download_semaphores = {}
-_upload_semaphores = {}  # Limit simultaneous uploads per user
+if TYPE_CHECKING:
+    import yt_dlp
 
+# Global cap on simultaneous downloads across all users; the Pi's CPU, disk
+# and RAM thrash when every request downloads at once
+MAX_CONCURRENT_DOWNLOADS = int(os.getenv('MAX_CONCURRENT_DOWNLOADS', '2'))
+_download_slots = asyncio.BoundedSemaphore(MAX_CONCURRENT_DOWNLOADS)
+_waiting_downloads = 0  # Jobs currently waiting for a download slot
 
-SUPPORTED_DOMAINS = [
-    'youtube.com', 'youtu.be', 'tiktok.com', 'x.com', 'twitter.com',
-    'instagram.com', 'facebook.com', 'vimeo.com', 'dailymotion.com'
-]
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-run
+_background_tasks = set()
+
+# Dedicated pool for blocking yt-dlp calls so they never run on the event loop
+# and concurrent downloads do not exhaust the default executor
+_ytdlp_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='yt-dlp')
+
+
+# Downloads get a fixed name inside their own temp dir, so titles never need
+# sanitizing or renaming on disk
+OUTPUT_TEMPLATE = 'video.%(ext)s'
+
+# Upload read size; FSInputFile streams the file, larger chunks mean fewer reads
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Skip YouTube HLS/DASH manifests - use direct formats
+YTDLP_EXTRACTOR_ARGS = {
+    'youtube': {
+        'skip': ['hls', 'dash']
+    }
+}
+
+# User-facing status/error texts (templates are filled with str.format)
+INVALID_URL_TEXT = (
+    "❌ *Invalid URL*\n\n"
+    "Please provide a valid video link starting with http:// or https://\n\n"
+    "Examples:\n"
+    "• https://www.youtube.com/watch?v=...\n"
+    "• https://www.tiktok.com/@.../video/...\n"
+    "• https://x.com/.../status/..."
+)
+UNKNOWN_SIZE_TEXT = (
+    "⚠️ *Could not determine video size*\n\n"
+    "Proceeding with caution. The encoded file may be large.\n\n"
+    "If it fails, try a shorter video or faster preset."
+)
+DOWNLOAD_TIMEOUT_TEXT = (
+    "❌ *Download Timeout*\n\n"
+    "The download took too long.\n\n"
+    "💡 Try:\n"
+    "• A shorter video\n"
+    "• A different video\n"
+    "• Check your internet connection"
+)
+DOWNLOAD_FAILED_TEXT = (
+    "❌ *Download Failed*\n\n"
+    "Error: {error}\n\n"
+    "💡 The video URL might be:\n"
+    "• Invalid or expired\n"
+    "• From an unsupported platform\n"
+    "• Protected/private\n\n"
+    "Try another video or check the URL."
+)
+VIDEO_TOO_LARGE_TEXT = (
+    "❌ *Video Too Large*\n\n"
+    "📏 Size: {size_mb:.1f}MB (limit ~55MB)\n\n"
+    "💡 Try a shorter video or different source"
+)
+UPLOAD_FAILED_TEXT = (
+    "❌ *Upload Failed*\n\n"
+    "The video could not be sent to Telegram.\n\n"
+    "Error: {error}\n\n"
+    "Please try again or contact support."
+)
+UNEXPECTED_ERROR_TEXT = (
+    "❌ *Unexpected Error*\n\n"
+    "Something went wrong: {error}\n\n"
+    "Please try again or contact support."
+)
+
+# http(s) scheme, host (netloc) of 1-255 chars, no whitespace
+_VALID_URL_RE = re.compile(r'(?i:https?)://[^\s/?#]{1,255}(?:[/?#]\S*)?\Z')
+
+# Direct file links are sized with one HEAD request instead of a yt-dlp probe
+_DIRECT_VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.webm', '.mov')
+HEAD_TIMEOUT_SECONDS = 10
+_http_session: Optional[aiohttp.ClientSession] = None  # Created lazily on the running loop
+
+# Options for metadata probes; the thread-local probe instances are built from these
+PROBE_YDL_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    # Metadata-only probe: skip format checks, manifests and playlist expansion
+    'skip_download': True,
+    'extract_flat': 'in_playlist',
+    'noplaylist': True,
+    'playlist_items': '1',  # Matches download_video; only the first entry is ever used
+    'check_formats': False,
+    'youtube_include_dash_manifest': False,
+    'youtube_include_hls_manifest': False,
+    'socket_timeout': 10,
+    'retries': 1,
+    # Same format pool as download_video so the info can be reused there
+    'extractor_args': YTDLP_EXTRACTOR_ARGS,
+}
+_probe_local = threading.local()
+
+# Probed metadata per canonical URL so repeat links skip the extraction round-trip
+INFO_CACHE_MAX_ENTRIES = 512
+INFO_CACHE_TTL_SECONDS = 600
+# Bulky info keys the bot never reads; dropped before caching so the cache
+# stays small and the per-caller copy stays cheap
+_UNUSED_INFO_KEYS = ('automatic_captions', 'subtitles', 'thumbnails', 'heatmap')
+_info_cache: 'OrderedDict[str, tuple[float, dict]]' = OrderedDict()
+_info_inflight: dict[str, asyncio.Task] = {}  # Extractions currently running, by cache key
+
+# Query parameters that never change which video a link points to
+_TRACKING_PARAMS = frozenset(['si', 'feature', 'fbclid', 'gclid', 'igsh', 'igshid'])
 
 def is_retryable_error(error: Exception) -> bool:
     """Classify if an error is retryable or not.
@@ -83,7 +196,7 @@ async def retry_with_backoff(
     max_delay: float = 30.0,
     user_id: int = None
 ) -> Any:
-    """Retry a function with exponential backoff.
+    """Retry a function with jittered exponential backoff.
     
     Args:
         func: Async function to retry
@@ -117,141 +230,243 @@ async def retry_with_backoff(
                 logger.error(f"All {max_attempts} upload attempts failed for user {user_id}: {e}")
                 raise
             
-            logger.warning(f"Upload attempt {attempt}/{max_attempts} failed for user {user_id}: {e}. Retrying in {delay}s...")
-            await asyncio.sleep(delay)
-            delay = min(delay * 2, max_delay)  # Exponential backoff with cap
+            # Full jitter in [0.5, 1.5) x delay so concurrent uploads don't retry in lockstep
+            jittered_delay = delay * (0.5 + random.random())
+            logger.warning(f"Upload attempt {attempt}/{max_attempts} failed for user {user_id}: {e}. Retrying in {jittered_delay:.1f}s...")
+            await asyncio.sleep(jittered_delay)
+            delay = min(delay * 2, max_delay)  # Exponential backoff with cap (applied before jitter)
     
     # Should never reach here
     raise last_error
 
 
+async def _run_blocking(func: Callable, *args) -> Any:
+    """Run a blocking (yt-dlp) call in the dedicated executor.
+    
+    Note: a timeout around this only stops waiting; the worker thread
+    keeps running until yt-dlp returns.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_ytdlp_executor, func, *args)
+
+
 def validate_url(url: str) -> bool:
     """Validate if URL is from a supported platform.
     
-    Performs both format validation and basic security checks.
+    Performs both format validation and basic security checks: http/https
+    scheme only (no file:// or other schemes), a non-empty host of at most
+    255 characters and at most 2048 characters overall. Any domain is
+    allowed since yt-dlp supports 1000+ sites.
     """
-    if not url or not isinstance(url, str):
+    if not isinstance(url, str) or len(url) > 2048:
         return False
+    return _VALID_URL_RE.match(url) is not None
+
+
+def _cache_key(url: str) -> str:
+    """Canonical form of a URL for the info cache (lowercase host without www., no tracking params)."""
+    parts = urlsplit(url.strip())
+    netloc = parts.netloc.lower()
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+    query = urlencode([
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k not in _TRACKING_PARAMS and not k.startswith('utm_')
+    ])
+    return urlunsplit((parts.scheme.lower(), netloc, parts.path, query, ''))
+
+
+def invalidate_video_info(url: str):
+    """Drop cached metadata for a URL (e.g. after its download failed)."""
+    _info_cache.pop(_cache_key(url), None)
+
+
+def _get_ytdlp():
+    """Import yt-dlp on first use.
     
-    # Limit URL length (max 2048 is standard)
-    if len(url) > 2048:
-        return False
+    Loading its extractors is slow and memory-heavy on a Pi, so it is not
+    paid at bot start; every caller runs on the yt-dlp executor, so the cold
+    import never blocks the event loop either.
+    """
+    import yt_dlp
+    return yt_dlp
+
+
+def _probe_ydl() -> 'yt_dlp.YoutubeDL':
+    """Metadata-only YoutubeDL for the calling executor thread.
     
+    Instances are not thread-safe, so each yt-dlp worker thread keeps its own
+    and reuses it (initialized extractors, cookie jar, HTTP handlers) across
+    probes instead of building a new one per URL.
+    """
+    ydl = getattr(_probe_local, 'ydl', None)
+    if ydl is None:
+        ydl = _probe_local.ydl = _get_ytdlp().YoutubeDL(PROBE_YDL_OPTS)
+    return ydl
+
+
+def _is_direct_video_url(url: str) -> bool:
+    """Return True if the URL path points straight at a video file."""
+    return urlsplit(url).path.lower().endswith(_DIRECT_VIDEO_EXTENSIONS)
+
+
+def _get_http_session() -> aiohttp.ClientSession:
+    """Shared aiohttp session for HEAD requests (one connection pool)."""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=8),
+            timeout=aiohttp.ClientTimeout(total=HEAD_TIMEOUT_SECONDS)
+        )
+    return _http_session
+
+
+async def close_http_session():
+    """Close the shared HEAD request session (call on shutdown)."""
+    global _http_session
+    if _http_session is not None:
+        await _http_session.close()
+        _http_session = None
+
+
+async def head_content_length(url: str) -> Optional[int]:
+    """Get the size of a direct file link from a HEAD request.
+    
+    Returns:
+        Content-Length in bytes, or None if the server does not report it
+    """
     try:
-        parsed = urlparse(url)
-        domain = parsed.netloc.lower().replace('www.', '')
-        
-        # Validate scheme is http/https
-        if parsed.scheme not in ['http', 'https']:
-            return False
-        
-        # Validate netloc exists and is not suspicious
-        if not parsed.netloc or len(parsed.netloc) > 255:
-            return False
-        
-        # Prevent file:// URIs and other schemes
-        if parsed.scheme.lower() not in ['http', 'https']:
-            return False
-        
-        # Allow any domain for yt-dlp (1000+ supported)
-        # Just basic URL validation
-        return True
-    except Exception:
-        return False
+        async with _get_http_session().head(url, allow_redirects=True) as response:
+            if response.status >= 400:
+                return None
+            return response.content_length
+    except Exception as e:
+        logger.debug(f"HEAD request failed for {url[:50]}...: {e}")
+        return None
+
+
+def _extract_info(url: str) -> Optional[dict]:
+    """Probe a URL (blocking) and drop the info keys the bot never uses."""
+    info = _probe_ydl().extract_info(url, download=False)
+    if info:
+        for unused_key in _UNUSED_INFO_KEYS:
+            info.pop(unused_key, None)
+    return info
+
+
+async def _extract_and_cache(url: str, key: str) -> Optional[dict]:
+    """Run one metadata extraction and store the result in the info cache."""
+    info = await _run_blocking(_extract_info, url)
+    if info:
+        _info_cache[key] = (time.monotonic(), info)
+        if len(_info_cache) > INFO_CACHE_MAX_ENTRIES:
+            _info_cache.popitem(last=False)
+    return info
+
 
+def _forget_inflight(key: str, task: asyncio.Task):
+    """Done callback: drop a finished extraction from the in-flight map."""
+    _info_inflight.pop(key, None)
+    if not task.cancelled():
+        task.exception()  # Mark as retrieved; waiters log it themselves
 
-async def get_file_size(url: str, timeout: int = 30) -> Optional[tuple[int, int]]:
-    """Extract file size and duration from video metadata using yt-dlp.
+
+async def probe_video_info(url: str, timeout: int = 30) -> Optional[dict]:
+    """Extract video metadata using yt-dlp without downloading.
+    
+    The returned info dict can be passed on to ``download_video`` so the
+    download reuses it instead of extracting the metadata again. Results are
+    cached for ``INFO_CACHE_TTL_SECONDS`` and concurrent calls for the same
+    URL share one extraction; callers get their own copy since yt-dlp
+    mutates the dict while downloading.
     
     Args:
         url: Video URL to check
         timeout: Maximum seconds to wait for metadata extraction (default: 30s)
     
     Returns:
-        Tuple of (file_size_bytes, duration_seconds) or (None, None)
+        yt-dlp info dict or None on error/timeout
     """
+    key = _cache_key(url)
+    cached = _info_cache.get(key)
+    if cached is not None:
+        if time.monotonic() - cached[0] < INFO_CACHE_TTL_SECONDS:
+            _info_cache.move_to_end(key)
+            return await asyncio.to_thread(copy.deepcopy, cached[1])
+        del _info_cache[key]
+    
+    # Single-flight: concurrent probes of the same URL share one extraction
+    task = _info_inflight.get(key)
+    if task is None:
+        task = _info_inflight[key] = asyncio.create_task(_extract_and_cache(url, key))
+        task.add_done_callback(lambda t: _forget_inflight(key, t))
+    
     try:
-        async def _extract_info():
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-                'socket_timeout': timeout,
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                # Get file size
-                filesize = info.get('filesize') or info.get('filesize_approx')
-                if not filesize:
-                    # Estimate from duration and bitrate
-                    duration = info.get('duration', 0)
-                    tbr = info.get('tbr', 0)
-                    if duration and tbr:
-                        filesize = int(duration * tbr * 125)  # tbr is in kbit/s
-                
-                # Get duration - required for size estimation
-                duration = info.get('duration')
-                
-                # Return filesize if available (even if 0), use duration for estimation
-                if filesize is not None and duration:
-                    return int(filesize), int(duration)
-                
-                # If we have duration but no filesize, still return it for estimation
-                if duration:
-                    return None, int(duration)
-                
-                return None, None
-        
-        # Apply timeout to metadata extraction
+        # Apply timeout to metadata extraction (shielded: other waiters keep it running)
         try:
-            result = await asyncio.wait_for(_extract_info(), timeout=timeout)
-            return result
+            info = await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
         except asyncio.TimeoutError:
             logger.warning(f"File size check timeout for URL: {url[:50]}...")
-            return None, None
+            return None
+        # Copied off the event loop; a full info dict takes milliseconds to copy
+        return await asyncio.to_thread(copy.deepcopy, info) if info else info
     except Exception as e:
         logger.error(f"Error getting file size: {str(e)}")
-        return None, None
+        return None
 
 
-def sanitize_filename(filename: str) -> str:
-    """Sanitize filename to be compatible with HandBrake and filesystems.
+def get_size_and_duration(info: Optional[dict]) -> tuple[Optional[int], Optional[int]]:
+    """Get (file_size_bytes, duration_seconds) from a yt-dlp info dict.
     
-    Removes or replaces problematic characters:
-    - Colons (:) - not allowed in Windows filenames
-    - Slashes (/ and backslash) - directory separators
-    - Other special characters that cause issues
+    Either value is None when it cannot be determined.
     """
-    # Remove or replace problematic characters
-    filename = filename.replace(':', '-')  # Replace colons with dashes
-    filename = filename.replace('/', '-')  # Replace forward slashes with dashes
-    filename = filename.replace('\\', '-')  # Replace backslashes with dashes
-    filename = filename.replace('?', '')   # Remove question marks
-    filename = filename.replace('"', '')   # Remove quotes
-    filename = filename.replace('<', '')   # Remove angle brackets
-    filename = filename.replace('>', '')
-    filename = filename.replace('|', '-')  # Replace pipes with dashes
-    filename = filename.replace('*', '')   # Remove asterisks
+    if not info:
+        return None, None
     
-    # Also handle unicode special characters that look like punctuation
-    filename = re.sub(r'[^\w\s\-\.]', '', filename)  # Keep only word chars, spaces, dashes, dots
+    # Get duration - required for size estimation
+    duration = info.get('duration')
     
-    # Remove leading/trailing spaces and dots
-    filename = filename.strip('. ')
+    # Get file size
+    filesize = info.get('filesize') or info.get('filesize_approx')
+    if not filesize:
+        # Estimate from duration and bitrate
+        tbr = info.get('tbr')
+        if duration and tbr:
+            filesize = int(duration * tbr * 125)  # tbr is in kbit/s -> bytes/s in one multiply
     
-    # Limit length to 200 chars (leave room for extension)
-    if len(filename) > 200:
-        filename = filename[:200]
+    # Return filesize if available (even if 0), use duration for estimation
+    if filesize is not None and duration:
+        return int(filesize), int(duration)
     
-    # Ensure filename is not empty
-    if not filename or filename.isspace():
-        filename = 'video'
+    # If we have duration but no filesize, still return it for estimation
+    if duration:
+        return None, int(duration)
     
-    return filename
+    return None, None
 
 
-async def download_video(url: str, temp_dir: str, status_msg: types.Message, timeout: int = 3600) -> Optional[str]:
+async def get_file_size(url: str, timeout: int = 30) -> tuple[Optional[dict], Optional[int]]:
+    """Get the file size of a video, plus the yt-dlp metadata it came from.
+    
+    Direct file links are sized with a HEAD request; anything else is probed
+    once with yt-dlp, and the info is returned so the download can reuse it.
+    
+    Args:
+        url: Video URL to check
+        timeout: Maximum seconds to wait for metadata extraction (default: 30s)
+    
+    Returns:
+        Tuple of (info, file_size_bytes); info is None for direct links and
+        either value is None when it cannot be determined
+    """
+    if _is_direct_video_url(url):
+        file_size = await head_content_length(url)
+        if file_size is not None:
+            return None, file_size
+    info = await probe_video_info(url, timeout=timeout)
+    return info, get_size_and_duration(info)[0]
+
+
+async def download_video(url: str, temp_dir: str, status_msg: types.Message, timeout: int = 3600, info: Optional[dict] = None) -> Optional[str]:
     """Download and optimize video using yt-dlp with native format selection.
     
     Uses dynamic resolution selection based on video duration:
@@ -266,32 +481,47 @@ async def download_video(url: str, temp_dir: str, status_msg: types.Message, tim
         temp_dir: Temporary directory (must exist)
         status_msg: Message to update with progress
         timeout: Maximum seconds to wait for download (default: 1 hour)
+        info: Metadata from ``probe_video_info`` (optional); when given, the
+            duration probe is skipped and the download reuses it
     
     Returns:
         Path to downloaded file or None on error
     """
+    progress_task = None
+    progress_editor = None
+    abort = None
+    download_future = None
     try:
         # Validate temp_dir
         if not temp_dir or not isinstance(temp_dir, str):
             logger.error("Invalid temp_dir")
             raise ValueError("Invalid temporary directory")
         
-        if not os.path.isdir(temp_dir):
+        if not await asyncio.to_thread(os.path.isdir, temp_dir):
             logger.error(f"Temp directory does not exist: {temp_dir}")
             raise ValueError("Temporary directory not found")
         
-        async def _get_duration():
+        # Shared throttle for all progress edits of this download
+        progress_editor = ThrottledEditor(status_msg)
+        progress_queue = asyncio.Queue(maxsize=1)  # Only the latest update is kept
+        abort = threading.Event()  # Set when we stop waiting; the progress hook then aborts yt-dlp
+        progress_hook = _make_progress_hook(progress_queue, asyncio.get_running_loop(), progress_editor.min_interval, abort)
+        progress_task = asyncio.create_task(_progress_consumer(progress_editor, progress_queue))
+        
+        def _get_duration():
             """Pre-fetch video duration for dynamic format selection."""
             try:
-                with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
-                    info = ydl.extract_info(url, download=False)
-                    return info.get('duration', 120)  # Default 120s if unknown
+                info = _probe_ydl().extract_info(url, download=False)
+                return info.get('duration', 120)  # Default 120s if unknown
             except Exception as e:
                 logger.warning(f"Could not get duration: {e}. Defaulting to 480p.")
                 return 120  # Default to longer duration assumption (480p)
         
-        async def _download(duration_seconds: int):
-            # Local variable to avoid Python 3.13 scoping issues with nested async functions
+        # _download assigns its own `info` locals, so bind the probed one under another name
+        probed_info = info
+        
+        def _download(duration_seconds: int):
+            # Local variable to avoid Python 3.13 scoping issues with nested functions
             download_url = url
             
             # Dynamically select resolution based on duration
@@ -316,27 +546,28 @@ async def download_video(url: str, temp_dir: str, status_msg: types.Message, tim
                 'merge_output_format': 'mp4',  # Native yt-dlp merge with correct aspect ratio
                 'quiet': False,
                 'no_warnings': False,
+                'noprogress': True,  # Progress reaches the user via progress_hooks; keep it out of stdout/journal
                 'socket_timeout': 30,
                 'playlist_items': '1',  # For quote tweets: take only first video
-                'outtmpl': os.path.join(temp_dir, '%(title)s.%(ext)s'),
-                'progress_hooks': [lambda d: asyncio.create_task(
-                    update_download_progress(status_msg, d)
-                )],
+                'outtmpl': os.path.join(temp_dir, OUTPUT_TEMPLATE),
+                'progress_hooks': [progress_hook],
                 'prefer_free_formats': True,  # Prefer formats without premium/restricted access
-                'extractor_args': {
-                    'youtube': {
-                        'skip': ['hls', 'dash']  # Skip HLS/DASH - use direct formats
-                    }
-                }
+                'extractor_args': YTDLP_EXTRACTOR_ARGS,
             }
             
             try:
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                with _get_ytdlp().YoutubeDL(ydl_opts) as ydl:
                     # Download with optimized format selection (no post-processing needed)
-                    info = ydl.extract_info(download_url, download=True)
-                    filename = ydl.prepare_filename(info)
+                    if probed_info:
+                        # Reuse probed metadata instead of a second network extraction
+                        result = ydl.process_ie_result(probed_info, download=True)
+                    else:
+                        result = ydl.extract_info(download_url, download=True)
+                    filename = ydl.prepare_filename(result)
                     return filename
             except Exception as e:
+                if abort.is_set():
+                    raise
                 # If primary download fails (e.g., age-restricted content), try fallback
                 logger.warning(f"Primary download attempt failed: {e}. Retrying with fallback options...")
                 
@@ -346,12 +577,14 @@ async def download_video(url: str, temp_dir: str, status_msg: types.Message, tim
                 fallback_opts_1['format'] = 'bestvideo[vcodec^=avc]+bestaudio/best'
                 
                 try:
-                    with yt_dlp.YoutubeDL(fallback_opts_1) as ydl:
+                    with _get_ytdlp().YoutubeDL(fallback_opts_1) as ydl:
                         info = ydl.extract_info(download_url, download=True)
                         filename = ydl.prepare_filename(info)
                         logger.info(f"Fallback 1 (no height restriction) successful")
                         return filename
                 except Exception as e2:
+                    if abort.is_set():
+                        raise
                     logger.warning(f"Fallback 1 failed: {e2}. Trying aggressive fallback...")
                     
                     # Fallback 2: Very aggressive - just get any playable format
@@ -360,12 +593,13 @@ async def download_video(url: str, temp_dir: str, status_msg: types.Message, tim
                         'quiet': True,
                         'socket_timeout': 30,
                         'playlist_items': '1',
-                        'outtmpl': os.path.join(temp_dir, '%(title)s.%(ext)s'),
+                        'outtmpl': os.path.join(temp_dir, OUTPUT_TEMPLATE),
+                        'progress_hooks': [progress_hook],
                         'prefer_free_formats': True,
                     }
                     
                     try:
-                        with yt_dlp.YoutubeDL(fallback_opts_2) as ydl:
+                        with _get_ytdlp().YoutubeDL(fallback_opts_2) as ydl:
                             info = ydl.extract_info(download_url, download=True)
                             filename = ydl.prepare_filename(info)
                             logger.info(f"Fallback 2 (best format) successful")
@@ -377,12 +611,20 @@ async def download_video(url: str, temp_dir: str, status_msg: types.Message, tim
                     logger.error(f"Fallback download also failed: {fallback_error}")
                     raise
         
-        # Get video duration first
-        duration_seconds = await asyncio.wait_for(_get_duration(), timeout=60)
+        # Get video duration first (from probed metadata when available)
+        if info and info.get('duration'):
+            duration_seconds = info['duration']
+        elif _is_direct_video_url(url):
+            # A direct file has a single format, so skip the probe and use the default
+            duration_seconds = 120
+        else:
+            duration_seconds = await asyncio.wait_for(_run_blocking(_get_duration), timeout=60)
         
-        # Apply timeout to download operation
+        # Apply timeout to download operation; the shield keeps the executor
+        # future around so the finally below can wait for the thread to stop
+        download_future = asyncio.get_running_loop().run_in_executor(_ytdlp_executor, _download, duration_seconds)
         try:
-            filename = await asyncio.wait_for(_download(duration_seconds), timeout=timeout)
+            filename = await asyncio.wait_for(asyncio.shield(download_future), timeout=timeout)
         except asyncio.TimeoutError:
             logger.error(f"Download timeout after {timeout}s for user")
             raise ValueError(f"Download took too long (timeout: {timeout}s)")
@@ -392,67 +634,126 @@ async def download_video(url: str, temp_dir: str, status_msg: types.Message, tim
             logger.error("Invalid filename from yt-dlp")
             raise ValueError("Failed to get filename")
         
-        if not os.path.exists(filename):
+        if not await asyncio.to_thread(os.path.exists, filename):
             logger.error(f"Downloaded file not found: {filename}")
             raise ValueError("Downloaded file not found")
         
-        # Sanitize the filename for compatibility
-        dir_path = os.path.dirname(filename)
-        file_basename = os.path.basename(filename)
-        name_without_ext = os.path.splitext(file_basename)[0]
-        ext = os.path.splitext(file_basename)[1]
-        
-        # Fix missing or incorrect extension
-        if not ext or ext == '.NA':
-            ext = '.mp4'
-        
-        sanitized_name = sanitize_filename(name_without_ext) + ext
-        sanitized_path = os.path.join(dir_path, sanitized_name)
-        
-        # Verify the path is within temp_dir (prevent directory traversal)
-        real_temp = os.path.realpath(temp_dir)
-        real_sanitized = os.path.realpath(sanitized_path)
+        # The output name is fixed by OUTPUT_TEMPLATE, so only a missing
+        # extension (yt-dlp writes '.NA') needs fixing up
+        stem, ext = os.path.splitext(filename)
+        if ext in ('', '.NA'):
+            fixed_path = stem + '.mp4'
+            await asyncio.to_thread(os.replace, filename, fixed_path)
+            filename = fixed_path
         
-        if not real_sanitized.startswith(real_temp):
-            logger.error(f"Path traversal detected: {sanitized_path}")
-            raise ValueError("Invalid file path")
-        
-        # Rename the file if necessary
-        if filename != sanitized_path:
-            os.rename(filename, sanitized_path)
-            logger.info(f"Renamed: {file_basename} -> {sanitized_name}")
-        
-        return sanitized_path
+        return filename
     except Exception as e:
         logger.error(f"Download error: {str(e)}")
         raise
+    finally:
+        if download_future and not download_future.done():
+            # Timed out or cancelled: make yt-dlp stop, and only return once its
+            # thread has, so the caller's download slot and temp dir cleanup
+            # never overlap a still-running download
+            abort.set()
+            await asyncio.wait([download_future])
+            if not download_future.cancelled():
+                download_future.exception()  # Retrieve the expected abort error so asyncio does not log it
+        if progress_task:
+            progress_task.cancel()
+        if progress_editor:
+            progress_editor.cancel()  # A deferred progress text must not overwrite later statuses
 
 
-async def update_download_progress(message: types.Message, data: dict):
-    """Update message with download progress."""
+def _make_progress_hook(queue: asyncio.Queue, loop: asyncio.AbstractEventLoop, min_interval: float, abort: threading.Event) -> Callable[[dict], None]:
+    """Build a yt-dlp progress hook that forwards at most one update per interval.
+    
+    yt-dlp calls hooks from its worker thread for every chunk, so the time
+    check happens here and accepted updates are handed to the loop with
+    ``call_soon_threadsafe`` (no coroutine or task per chunk). Ticks that
+    would not change the displayed size estimate are dropped as well.
+    Once ``abort`` is set the hook raises, which makes yt-dlp stop the download.
+    """
+    next_update = [0.0]  # Monotonic deadline, only touched by the yt-dlp thread
+    last_total_mb = [None]  # Last forwarded size estimate, as shown to the user
+    
+    def hook(data: dict):
+        if abort.is_set():
+            raise ValueError("Download aborted")
+        if data.get('status') != 'downloading':
+            return
+        # The status only shows the whole-MB size estimate; skip ticks that would not change it
+        total_bytes = data.get('total_bytes') or data.get('_total_bytes_estimate')
+        if not total_bytes:
+            return
+        total_mb = round(total_bytes / (1024 * 1024))
+        if total_mb == last_total_mb[0]:
+            return
+        now = time.monotonic()
+        if now < next_update[0]:
+            return
+        next_update[0] = now + min_interval
+        last_total_mb[0] = total_mb
+        loop.call_soon_threadsafe(_offer_latest, queue, data)
+    
+    return hook
+
+
+def _offer_latest(queue: asyncio.Queue, item: Any):
+    """Put an item on a bounded queue, replacing a pending one if it is full."""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
+
+
+async def _progress_consumer(editor: ThrottledEditor, queue: asyncio.Queue):
+    """Single consumer that applies queued progress updates one at a time."""
+    while True:
+        data = await queue.get()
+        await update_download_progress(editor, data)
+
+
+async def update_download_progress(editor: ThrottledEditor, data: dict):
+    """Update status message with download progress (throttled by the editor)."""
     try:
         if data['status'] == 'downloading':
-            # Only show size estimate once to reduce message updates
-            if data.get('_total_bytes_estimate') and not hasattr(update_download_progress, '_size_shown'):
-                total_mb = data['_total_bytes_estimate'] / (1024 * 1024)
+            total_bytes = data.get('total_bytes') or data.get('_total_bytes_estimate')
+            if total_bytes:
+                total_mb = total_bytes / (1024 * 1024)
                 try:
-                    await message.edit_text(f"⬇️ Downloading video...\n({total_mb:.0f}MB estimated)")
-                    update_download_progress._size_shown = True
+                    await editor.set(f"⬇️ Downloading video...\n({total_mb:.0f}MB estimated)")
                 except Exception:
                     pass
-        elif data['status'] == 'finished':
-            # Clear flag for next download
-            if hasattr(update_download_progress, '_size_shown'):
-                delattr(update_download_progress, '_size_shown')
     except Exception as e:
         logger.debug(f"Progress update error: {str(e)}")
 
 
-async def _get_semaphore(user_id: int) -> asyncio.Semaphore:
-    """Get or create a semaphore for a user to limit concurrent downloads."""
-    if user_id not in _download_semaphores:
-        _download_semaphores[user_id] = asyncio.Semaphore(1)  # 1 download per user at a time
-    return _download_semaphores[user_id]
+async def _cleanup_tempdir(temp_dir: str, user_id: int):
+    """Remove a temp directory using the default thread pool executor."""
+    try:
+        await asyncio.to_thread(shutil.rmtree, temp_dir, ignore_errors=True)
+        logger.debug("Cleaned up temp directory for user %s", user_id)  # Formatted only if DEBUG is on
+    except Exception as e:
+        logger.warning(f"Failed to cleanup temp directory for user {user_id}: {e}")
+
+
+def _make_temp_dir(user_id: int, base_dir: Optional[str]) -> str:
+    """Create a per-download temp directory under base_dir.
+    
+    Pointing DOWNLOAD_DIR at a tmpfs such as /dev/shm keeps downloads off the
+    SD card; falls back to the system temp dir if base_dir does not exist.
+    """
+    if base_dir and not os.path.isdir(base_dir):
+        logger.warning(f"DOWNLOAD_DIR {base_dir} not found, using system temp dir")
+        base_dir = None
+    return tempfile.mkdtemp(prefix=f"video_{user_id}_", dir=base_dir)
+
+
+def _schedule_tempdir_cleanup(temp_dir: str, user_id: int):
+    """Remove a temp directory in a background task (kept referenced until done)."""
+    task = asyncio.create_task(_cleanup_tempdir(temp_dir, user_id))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
 
 async def process_download(message: types.Message, state: FSMContext, db: Database, url: str, config, download_states=None):
@@ -463,6 +764,7 @@ async def process_download(message: types.Message, state: FSMContext, db: Databa
     """
     user_id = message.from_user.id
     status_msg = None
+    temp_dir = None
     waiting_for_confirmation = False
     
     # Validate input parameters
@@ -483,53 +785,37 @@ async def process_download(message: types.Message, state: FSMContext, db: Databa
         # Validate URL
         if not validate_url(url):
             try:
-                await message.answer(
-                    "❌ *Invalid URL*\n\n"
-                    "Please provide a valid video link starting with http:// or https://\n\n"
-                    "Examples:\n"
-                    "• https://www.youtube.com/watch?v=...\n"
-                    "• https://www.tiktok.com/@.../video/...\n"
-                    "• https://x.com/.../status/..."
-                )
+                await message.answer(INVALID_URL_TEXT)
             except Exception as e:
                 logger.error(f"Failed to send URL validation error to user {user_id}: {e}")
             return
         
-        # Send status message
+        # Send status message (one message for the whole check, no follow-up edit)
         try:
-            status_msg = await message.answer("🔍 Validating URL and checking video info...")
+            status_msg = await message.answer("📊 Analyzing video metadata...")
         except Exception as e:
             logger.error(f"Failed to send status message to user {user_id}: {e}")
             return
         
         # Get file size and duration
         logger.info(f"Checking file size for URL: {url[:50]}... (user {user_id})")
-        try:
-            await status_msg.edit_text("📊 Analyzing video metadata...")
-        except Exception as e:
-            logger.warning(f"Failed to update status message for user {user_id}: {e}")
         
-        result = await get_file_size(url, timeout=30)
-        file_size = None
-        duration = None
-        
-        if result:
-            file_size, duration = result
+        # The temp dir does not depend on the probe, so create it meanwhile
+        temp_dir_task = asyncio.create_task(asyncio.to_thread(_make_temp_dir, user_id, getattr(config, 'DOWNLOAD_DIR', None)))
+        try:
+            info, file_size = await get_file_size(url, timeout=30)
+        finally:
+            # Shielded so a cancelled probe still gets the dir back for cleanup
+            temp_dir = await asyncio.shield(temp_dir_task)
         
         # Check if file size exceeds limit
         if file_size is None:
             try:
-                await status_msg.edit_text(
-                    "⚠️ *Could not determine video size*\n\n"
-                    "Proceeding with caution. The encoded file may be large.\n\n"
-                    "If it fails, try a shorter video or faster preset.",
-                    parse_mode="Markdown"
-                )
+                await status_msg.edit_text(UNKNOWN_SIZE_TEXT, parse_mode="Markdown")
             except Exception as e:
                 logger.warning(f"Failed to update status for user {user_id}: {e}")
             logger.warning(f"Could not get file size for user {user_id}")
             # Proceed with download anyway
-            await execute_confirmed_download(user_id, message, state, db, url, config, download_states)
         elif file_size > config.MAX_FILE_SIZE:  # file_size > 50MB
             # Large file - video is already optimized by yt-dlp during download
             logger.info(f"Large source file ({file_size / (1024*1024):.0f}MB) for user {user_id}: proceeding with download - will be optimized")
@@ -538,27 +824,26 @@ async def process_download(message: types.Message, state: FSMContext, db: Databa
                 await status_msg.edit_text("⬇️ Large file detected. Starting download with optimization...")
             except Exception as e:
                 logger.warning(f"Failed to update status for user {user_id}: {e}")
-            
-            # Proceed directly with download
-            await execute_confirmed_download(user_id, message, state, db, url, config, download_states)
-        else:
-            # File size is OK, proceed with download
-            await execute_confirmed_download(user_id, message, state, db, url, config, download_states)
+        
+        # execute_confirmed_download owns (and removes) the temp dir from here on
+        download_dir, temp_dir = temp_dir, None
+        await execute_confirmed_download(user_id, message, state, db, url, config, download_states, info=info, temp_dir=download_dir)
     
     except Exception as e:
         logger.error(f"Error in process_download: {str(e)}")
         if status_msg:
             try:
-                await status_msg.edit_text(
-                    f"❌ *Unexpected Error*\n\n"
-                    f"Something went wrong: {str(e)[:80]}\n\n"
-                    f"Please try again or contact support."
-                )
+                await status_msg.edit_text(UNEXPECTED_ERROR_TEXT.format(error=str(e)[:80]))
             except Exception as edit_error:
                 logger.error(f"Failed to send error message to user: {edit_error}")
         await state.clear()
     
     finally:
+        # Set only if we failed or were cancelled before handing the dir over;
+        # scheduling is synchronous, so it happens even on cancellation
+        if temp_dir:
+            _schedule_tempdir_cleanup(temp_dir, user_id)
+        
         # Only delete status message if not waiting for user confirmation
         # (confirmation handler will delete it after user clicks yes/no)
         if status_msg and not waiting_for_confirmation:
@@ -568,7 +853,7 @@ async def process_download(message: types.Message, state: FSMContext, db: Databa
                 logger.debug(f"Failed to delete status message: {e}")
 
 
-async def execute_confirmed_download(user_id: int, message: types.Message, state: FSMContext, db: Database, url: str, config, download_states=None):
+async def execute_confirmed_download(user_id: int, message: types.Message, state: FSMContext, db: Database, url: str, config, download_states=None, info: Optional[dict] = None, temp_dir: Optional[str] = None):
     """Execute download after user confirmation (skips file size re-check).
     
     Downloads video and uploads directly to Telegram. Video is already optimized by yt-dlp
@@ -582,222 +867,163 @@ async def execute_confirmed_download(user_id: int, message: types.Message, state
         url: The video URL to download
         config: Bot configuration
         download_states: FSM states (optional)
+        info: Metadata from ``probe_video_info`` to reuse for the download (optional)
+        temp_dir: Already created temp directory to download into (optional);
+            it is removed when the download finishes either way
     """
+    global _waiting_downloads
     status_msg = None
-    temp_dir = None
     downloaded_file = None
-    duration_seconds = 0
-    
-    # Get semaphore for this user to limit concurrent downloads
-    semaphore = await _get_semaphore(user_id)
     
-    async with semaphore:  # Limit concurrent downloads per user
-        try:
-            if download_states:
-                await state.set_state(download_states.downloading.state)
-                logger.info(f"FSM state set to downloading for user {user_id}")
-            
-            # Create temp directory
-            temp_dir = tempfile.mkdtemp(prefix=f"video_{user_id}_")
-            if not os.path.isdir(temp_dir):
-                raise ValueError(f"Failed to create temp directory")
-            logger.info(f"Created temp directory: {temp_dir}")
-            
-            # Get or create status message
-            if isinstance(message, types.Message):
-                try:
-                    status_msg = await message.answer("⬇️ Downloading video...\n_This may take a few minutes..._")
-                except Exception as e:
-                    logger.error(f"Failed to send download status to user {user_id}: {e}")
-                    return
-            else:
-                logger.error(f"Invalid message object for user {user_id}")
-                return
-            
-            # Download video
-            logger.info(f"Starting download for user {user_id}")
+    try:
+        if download_states:
+            await state.set_state(download_states.downloading.state)
+            logger.info(f"FSM state set to downloading for user {user_id}")
+        
+        # Create temp directory unless the caller made one (mkdtemp raises OSError on failure)
+        if temp_dir is None:
+            temp_dir = await asyncio.to_thread(_make_temp_dir, user_id, getattr(config, 'DOWNLOAD_DIR', None))
+        logger.info(f"Using temp directory: {temp_dir}")
+        
+        # Get or create status message
+        if isinstance(message, types.Message):
             try:
-                downloaded_file = await download_video(url, temp_dir, status_msg, timeout=3600)
-                logger.info(f"Downloaded: {downloaded_file}")
-            except asyncio.TimeoutError:
+                status_msg = await message.answer("⬇️ Downloading video...\n_This may take a few minutes..._")
+            except Exception as e:
+                logger.error(f"Failed to send download status to user {user_id}: {e}")
+                return
+        else:
+            logger.error(f"Invalid message object for user {user_id}")
+            return
+        
+        # Download video
+        logger.info(f"Starting download for user {user_id}")
+        try:
+            if _download_slots.locked():
+                _waiting_downloads += 1
                 try:
-                    await status_msg.edit_text(
-                        f"❌ *Download Timeout*\n\n"
-                        f"The download took too long.\n\n"
-                        f"💡 Try:\n"
-                        f"• A shorter video\n"
-                        f"• A different video\n"
-                        f"• Check your internet connection",
-                        parse_mode="Markdown"
-                    )
+                    # A snapshot of how many jobs wait, not a live queue position
+                    await status_msg.edit_text(f"⏳ Queued: {_waiting_downloads} waiting\n_Waiting for a free download slot..._")
                 except Exception:
                     pass
-                logger.error(f"Download timeout for user {user_id}")
-                await state.clear()
-                return
-            except Exception as e:
                 try:
-                    await status_msg.edit_text(
-                        f"❌ *Download Failed*\n\n"
-                        f"Error: {str(e)[:100]}\n\n"
-                        f"💡 The video URL might be:\n"
-                        f"• Invalid or expired\n"
-                        f"• From an unsupported platform\n"
-                        f"• Protected/private\n\n"
-                        f"Try another video or check the URL.",
-                        parse_mode="Markdown"
-                    )
+                    await _download_slots.acquire()
+                finally:
+                    _waiting_downloads -= 1
+                try:
+                    await status_msg.edit_text("⬇️ Downloading video...\n_This may take a few minutes..._")
                 except Exception:
                     pass
-                logger.error(f"Download error for user {user_id}: {str(e)}")
-                await state.clear()
-                return
-            
-            # Get downloaded file size and duration
+            else:
+                await _download_slots.acquire()
             try:
-                downloaded_size = os.path.getsize(downloaded_file)
-                # Try to get duration from state data if available
-                state_data = await state.get_data()
-                duration_seconds = state_data.get('duration_seconds', 0)
-                if not duration_seconds:
-                    # If no duration, try to estimate from file size
-                    # Rough estimate: 1 minute of video ≈ 2-3 MB
-                    duration_seconds = int((downloaded_size / (1024 * 1024)) / 2.5 * 60)
-            except Exception as e:
-                logger.warning(f"Could not get downloaded file size or duration for user {user_id}: {e}")
-                downloaded_size = 0
-                duration_seconds = 0
-            
-            # Upload the optimized video directly
-            logger.info(f"Uploading optimized video ({downloaded_size / (1024*1024):.1f}MB) for user {user_id}")
-            
+                downloaded_file = await download_video(url, temp_dir, status_msg, timeout=3600, info=info)
+            finally:
+                _download_slots.release()
+            logger.info(f"Downloaded: {downloaded_file}")
+        except asyncio.TimeoutError:
             try:
-                await status_msg.delete()
+                await status_msg.edit_text(DOWNLOAD_TIMEOUT_TEXT, parse_mode="Markdown")
             except Exception:
                 pass
-            
-            # File is already optimized by yt-dlp with dynamic resolution/bitrate
-            output_file = downloaded_file
-            
-            # Check file size
-            try:
-                output_size = os.path.getsize(output_file)
-                logger.info(f"Uploading optimized video: {output_size / (1024*1024):.1f}MB for user {user_id}")
-            except Exception as e:
-                logger.error(f"Failed to get file size for user {user_id}: {e}")
-                try:
-                    await message.answer("❌ Error checking video file size.")
-                except Exception:
-                    pass
-                await state.clear()
-                return
-            
-            # Check if file is too large
-            if output_size > int(config.MAX_FILE_SIZE * 1.1):
-                try:
-                    await message.answer(
-                        f"❌ *Video Too Large*\n\n"
-                        f"📏 Size: {output_size / (1024*1024):.1f}MB (limit ~55MB)\n\n"
-                        f"💡 Try a shorter video or different source",
-                        parse_mode="Markdown"
-                    )
-                except Exception:
-                    pass
-                await state.clear()
-                return
-            
-            # Send status
+            logger.error(f"Download timeout for user {user_id}")
+            invalidate_video_info(url)
+            await state.clear()
+            return
+        except Exception as e:
             try:
-                status_msg = await message.answer("✅ Download successful!\n📤 Uploading to Telegram...")
-            except Exception as e:
-                logger.error(f"Failed to send upload status to user {user_id}: {e}")
-                await state.clear()
-                return
-            
-            # Upload video
+                await status_msg.edit_text(DOWNLOAD_FAILED_TEXT.format(error=str(e)[:100]), parse_mode="Markdown")
+            except Exception:
+                pass
+            logger.error(f"Download error for user {user_id}: {str(e)}")
+            invalidate_video_info(url)
+            await state.clear()
+            return
+        
+        try:
+            await status_msg.delete()
+        except Exception:
+            pass
+        
+        # File is already optimized by yt-dlp with dynamic resolution/bitrate
+        output_file = downloaded_file
+        
+        # Check file size (stat off the event loop)
+        try:
+            output_size = await asyncio.to_thread(os.path.getsize, output_file)
+            logger.info(f"Uploading optimized video: {output_size / (1024*1024):.1f}MB for user {user_id}")
+        except Exception as e:
+            logger.error(f"Failed to get file size for user {user_id}: {e}")
             try:
-                if user_id not in _upload_semaphores:
-                    _upload_semaphores[user_id] = asyncio.Semaphore(1)
-                
-                async with _upload_semaphores[user_id]:
-                    async def upload_task():
-                        return await message.bot.send_video(
-                            chat_id=user_id,
-                            video=FSInputFile(output_file),
-                            caption=f"✅ *Video Downloaded*\n\n📏 Size: {output_size / (1024*1024):.1f}MB",
-                            parse_mode="Markdown"
-                        )
-                    
-                    logger.info(f"Starting upload for optimized file ({output_size / (1024*1024):.1f}MB)")
-                    video_msg = await retry_with_backoff(upload_task, max_attempts=3, user_id=user_id)
-                    logger.info(f"Successfully uploaded video for user {user_id}")
-            except Exception as e:
-                logger.error(f"Upload failed for user {user_id}: {e}")
-                try:
-                    await status_msg.edit_text(
-                        f"❌ *Upload Failed*\n\n"
-                        f"The video could not be sent to Telegram.\n\n"
-                        f"Error: {str(e)[:80]}\n\n"
-                        f"Please try again or contact support."
-                    )
-                except Exception:
-                    pass
-                await state.clear()
-                return
-            
-            # Success! Delete status message
+                await message.answer("❌ Error checking video file size.")
+            except Exception:
+                pass
+            await state.clear()
+            return
+        
+        # Check if file is too large
+        if output_size > int(config.MAX_FILE_SIZE * 1.1):
             try:
-                await status_msg.delete()
-            except Exception as e:
-                logger.debug(f"Failed to delete status message for user {user_id}: {e}")
-            
-            # Download complete - just clear state, no completion message needed
+                await message.answer(VIDEO_TOO_LARGE_TEXT.format(size_mb=output_size / (1024*1024)), parse_mode="Markdown")
+            except Exception:
+                pass
+            await state.clear()
+            return
+        
+        # Send status
+        try:
+            status_msg = await message.answer("✅ Download successful!\n📤 Uploading to Telegram...")
+        except Exception as e:
+            logger.error(f"Failed to send upload status to user {user_id}: {e}")
             await state.clear()
+            return
+        
+        # Upload video
+        try:
+            async def upload_task():
+                return await message.bot.send_video(
+                    chat_id=user_id,
+                    video=FSInputFile(output_file, chunk_size=UPLOAD_CHUNK_SIZE),
+                    caption=f"✅ *Video Downloaded*\n\n📏 Size: {output_size / (1024*1024):.1f}MB",
+                    parse_mode="Markdown",
+                    supports_streaming=True  # Playback can start before the whole file is fetched
+                )
             
-            # Cleanup temp directory
+            logger.info(f"Starting upload for optimized file ({output_size / (1024*1024):.1f}MB)")
+            video_msg = await retry_with_backoff(upload_task, max_attempts=3, user_id=user_id)
+            logger.info(f"Successfully uploaded video for user {user_id}")
+        except Exception as e:
+            logger.error(f"Upload failed for user {user_id}: {e}")
             try:
-                import threading
-                def cleanup():
-                    try:
-                        if os.path.isdir(temp_dir):
-                            shutil.rmtree(temp_dir)
-                            logger.debug(f"Cleaned up temp directory for user {user_id}")
-                    except Exception as e:
-                        logger.warning(f"Failed to cleanup temp directory for user {user_id}: {e}")
-                
-                thread = threading.Thread(target=cleanup, daemon=True)
-                thread.start()
+                await status_msg.edit_text(UPLOAD_FAILED_TEXT.format(error=str(e)[:80]))
             except Exception:
                 pass
+            await state.clear()
+            return
         
+        # Success! Delete status message
+        try:
+            await status_msg.delete()
         except Exception as e:
-            logger.error(f"Error in execute_confirmed_download: {str(e)}")
-            if status_msg:
-                try:
-                    await status_msg.edit_text(
-                        f"❌ *Unexpected Error*\n\n"
-                        f"Something went wrong: {str(e)[:80]}\n\n"
-                        f"Please try again or contact support."
-                    )
-                except Exception:
-                    pass
-            await state.clear()
+            logger.debug(f"Failed to delete status message for user {user_id}: {e}")
         
-        finally:
-            # Cleanup temp directory if we got here with an error
-            if temp_dir:
-                try:
-                    import threading
-                    def cleanup():
-                        try:
-                            if os.path.isdir(temp_dir):
-                                shutil.rmtree(temp_dir)
-                        except Exception:
-                            pass
-                    thread = threading.Thread(target=cleanup, daemon=True)
-                    thread.start()
-                except Exception:
-                    pass
+        # Download complete - just clear state, no completion message needed
+        # (temp directory is cleaned up in the finally block below)
+        await state.clear()
+    
+    except Exception as e:
+        logger.error(f"Error in execute_confirmed_download: {str(e)}")
+        if status_msg:
+            try:
+                await status_msg.edit_text(UNEXPECTED_ERROR_TEXT.format(error=str(e)[:80]))
+            except Exception:
+                pass
+        await state.clear()
+    
+    finally:
+        # Cleanup temp directory in the background (runs on success and error)
+        if temp_dir:
+            _schedule_tempdir_cleanup(temp_dir, user_id)
 
 
 # End of file
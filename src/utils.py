@@ -1,8 +1,13 @@
 """Utility functions and logging configuration."""
 
+import asyncio
+import atexit
 import logging
-from logging.handlers import TimedRotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
 import os
+import queue
+import time
+from typing import Optional
 
 # Logging configuration
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -27,12 +32,19 @@ file_handler = TimedRotatingFileHandler(
     encoding='utf-8'
 )
 file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
 
 # Console handler
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
+
+# Records are only queued on the calling (event loop) thread; a listener
+# thread does the file/console writes
+log_queue = queue.SimpleQueue()
+logger.addHandler(QueueHandler(log_queue))
+logger.propagate = False  # Root's basicConfig handler would write every record again, synchronously
+log_listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)  # Drains queued records on exit
 
 
 async def get_user_setting(db, user_id: int, key: str, default=None):
@@ -44,3 +56,71 @@ async def get_user_setting(db, user_id: int, key: str, default=None):
 async def set_user_setting(db, user_id: int, key: str, value: str):
     """Set a user setting in database."""
     await db.set_user_setting(user_id, key, value)
+
+
+class ThrottledEditor:
+    """Edit a status message at most once per ``min_interval`` seconds.
+    
+    Telegram rejects too-frequent edits (429) and identical ones
+    ("message is not modified"), so both are avoided locally. A throttled
+    text is kept and sent once the interval expires; a newer one replaces
+    it (last write wins).
+    """
+    
+    def __init__(self, message, min_interval: float = 2.0):
+        self.message = message
+        self.min_interval = min_interval
+        self.last_edit = float('-inf')  # When the last edit was attempted
+        self.last_text = None  # Text of the last successful edit
+        self._pending: Optional[tuple[str, dict]] = None
+        self._flush_task: Optional[asyncio.Task] = None
+    
+    async def set(self, text: str, force: bool = False, **kwargs) -> bool:
+        """Edit the message text unless throttled. Returns True if an edit was sent.
+        
+        A throttled text is deferred rather than dropped.
+        """
+        if text == self.last_text:
+            self._pending = None  # The message already shows the latest text
+            return False
+        
+        if not force and time.monotonic() - self.last_edit < self.min_interval:
+            self._pending = (text, kwargs)
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush_pending())
+            return False
+        
+        self._pending = None
+        await self._edit(text, kwargs)
+        return True
+    
+    def cancel(self):
+        """Drop any deferred text, e.g. before the message is reused or deleted."""
+        self._pending = None
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+    
+    async def _edit(self, text: str, kwargs: dict):
+        self.last_edit = time.monotonic()
+        await self.message.edit_text(text, **kwargs)
+        self.last_text = text
+    
+    async def _flush_pending(self):
+        """Send the deferred text once the interval since the last edit expires."""
+        try:
+            while self._pending is not None:
+                remaining = self.min_interval - (time.monotonic() - self.last_edit)
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+                    continue
+                text, kwargs = self._pending
+                self._pending = None
+                if text != self.last_text:
+                    try:
+                        await self._edit(text, kwargs)
+                    except Exception as e:
+                        logger.debug(f"Deferred status edit failed: {e}")
+        finally:
+            if self._flush_task is asyncio.current_task():
+                self._flush_task = None